@@ -12,12 +12,22 @@ Author: Manus AI (Operation Nexus)
 """
 
 import os
+import argparse
+import math
+import hashlib
+import functools
+import numba
 import numpy as np
+import resampy
 import soundfile as sf
+from scipy.signal import resample_poly
 from pathlib import Path
-from typing import Tuple, List
+from typing import Dict, Tuple, List, Optional
+from itertools import chain
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import multiprocessing
+import multiprocessing.util
 import logging
-import random
 
 # Configure logging
 logging.basicConfig(
@@ -27,29 +37,177 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Upper bound on clip length for the reusable noise buffer (2s @ 16kHz)
+MAX_AUDIO_SAMPLES = 32000
+
+# Sample rate the background cache is pre-warmed at (other rates fill lazily)
+BACKGROUND_SAMPLE_RATE = 16000
+
+# Supported augmented output formats
+OUTPUT_FORMATS = ("wav", "npz")
+
+# Random generator for noise selection and offsets (replaced per sample in
+# pool workers from a child of the parent's SeedSequence)
+_RNG = np.random.default_rng()
+
+# Per-process state for pool workers (set by _init_worker)
+_worker_augmenter: Optional["AudioAugmenter"] = None
+
+
+@numba.njit(fastmath=True, cache=True)
+def _add_noise_kernel(audio: np.ndarray, noise: np.ndarray, snr_db: float, out: np.ndarray) -> bool:
+    """
+    Mix noise into audio at the given SNR, writing the result to out.
+    
+    Args:
+        audio: Clean audio signal (contiguous float32)
+        noise: Noise signal of the same length (contiguous float32)
+        snr_db: Signal-to-noise ratio in dB
+        out: Output buffer of the same length as audio
+        
+    Returns:
+        True if noise was mixed in, False if the noise was silent and out
+        holds an unmodified copy of audio
+    """
+    # Accumulate both energies in one pass; lengths match, so the
+    # ratio of sums equals the ratio of mean powers
+    signal_energy = 0.0
+    noise_energy = 0.0
+    for i in range(audio.shape[0]):
+        signal_energy += audio[i] * audio[i]
+        noise_energy += noise[i] * noise[i]
+    
+    # Silent noise cannot reach any SNR; the division below would raise
+    # (and fastmath assumes no inf/NaN), so pass the audio through instead
+    if noise_energy == 0.0:
+        for i in range(audio.shape[0]):
+            out[i] = audio[i]
+        return False
+    
+    snr_linear = 10.0 ** (snr_db / 10.0)
+    scale = np.sqrt(signal_energy / (snr_linear * noise_energy))
+    
+    for i in range(audio.shape[0]):
+        out[i] = audio[i] + scale * noise[i]
+    return True
+
+
+@functools.lru_cache(maxsize=None)
+def _load_background(file_path: str, target_sr: int, cache_dir: str) -> Optional[np.ndarray]:
+    """
+    Load a background noise file resampled to target_sr, decoding it only once.
+    
+    The resampled audio is persisted as a .npy file keyed by path, size, mtime
+    and rate, then memory-mapped so pool workers share the same physical pages.
+    
+    Args:
+        file_path: Path to background noise file
+        target_sr: Sample rate to resample to
+        cache_dir: Directory holding cached .npy arrays
+        
+    Returns:
+        Read-only audio array at target_sr, or None if loading failed
+    """
+    try:
+        stat = os.stat(file_path)
+        key = f"{os.path.abspath(file_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        cache_path = Path(cache_dir) / f"{hashlib.sha1(key.encode()).hexdigest()}_{target_sr}.npy"
+        
+        if not cache_path.exists():
+            data, sr = sf.read(file_path, dtype='float32', always_2d=False)
+            if data.ndim > 1:
+                data = data.mean(axis=1)
+            if sr != target_sr:
+                # Polyphase resampling with anti-aliasing filter
+                g = math.gcd(sr, target_sr)
+                data = resample_poly(data, target_sr // g, sr // g).astype(np.float32, copy=False)
+            
+            # Write to a per-process temp file first; workers may race on a new rate
+            tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, 'wb') as f:
+                np.save(f, data)
+            try:
+                os.replace(tmp_path, cache_path)
+            except PermissionError:
+                # On Windows the replace fails while another worker has the
+                # finished file memory-mapped; its copy is just as good
+                os.remove(tmp_path)
+                if not cache_path.exists():
+                    raise
+        
+        return np.load(cache_path, mmap_mode='r')
+    except Exception as e:
+        logger.error(f"Failed to load {file_path}: {e}")
+        return None
+
 
 class AudioAugmenter:
     """Handles audio augmentation for wake-word training data."""
     
-    def __init__(self, data_dir: str = "../../data"):
+    def __init__(self, data_dir: str = "../../data", num_workers: Optional[int] = None,
+                 output_format: str = "wav", seed: Optional[int] = None):
         """
         Initialize the audio augmenter.
         
         Args:
             data_dir: Base directory containing audio data
+            num_workers: Number of worker processes (None lets ProcessPoolExecutor
+                choose, which respects its Windows limit of 61)
+            output_format: "wav" for one file per variant, or "npz" for one
+                bundle per positive sample holding every variant
+            seed: Optional seed for reproducible runs (fresh entropy if None)
+            
+        Raises:
+            ValueError: If output_format is not supported
         """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format '{output_format}'. Use one of {OUTPUT_FORMATS}.")
+        
         self.data_dir = Path(data_dir)
+        self.num_workers = num_workers
+        self.output_format = output_format
+        self.seed = seed
         self.positive_dir = self.data_dir / "positive"
         self.background_dir = self.data_dir / "background"
         self.augmented_dir = self.data_dir / "augmented"
+        self.cache_dir = self.data_dir / "_cache" / "background"
+        
+        # Background noise files, filled once by augment_all
+        self._bg_files: Tuple[str, ...] = ()
+        
+        # Scratch buffer for tiling short noise clips and writer threads; both
+        # are only needed where samples are augmented, so create them lazily
+        self._noise_scratch: Optional[np.ndarray] = None
+        self._io_pool: Optional[ThreadPoolExecutor] = None
         
-        # Create augmented directory
+        # Create augmented and cache directories
         self.augmented_dir.mkdir(parents=True, exist_ok=True)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+    
+    def _get_io_pool(self) -> ThreadPoolExecutor:
+        """
+        Get the writer thread pool, creating it on first use.
+        
+        Returns:
+            Thread pool for audio writes (soundfile releases the GIL while writing)
+        """
+        if self._io_pool is None:
+            self._io_pool = ThreadPoolExecutor(max_workers=4)
+        return self._io_pool
+    
+    def close(self) -> None:
+        """Wait for pending writes and shut down the writer thread pool."""
+        if self._io_pool is not None:
+            self._io_pool.shutdown(wait=True)
+            self._io_pool = None
     
     def load_audio(self, file_path: Path) -> Tuple[np.ndarray, int]:
         """
         Load audio file.
         
+        Multi-channel files are downmixed to mono, since every augmentation
+        works on 1-D signals.
+        
         Args:
             file_path: Path to audio file
             
@@ -57,7 +215,9 @@ class AudioAugmenter:
             Tuple of (audio_data, sample_rate)
         """
         try:
-            data, sr = sf.read(file_path)
+            data, sr = sf.read(file_path, dtype='float32', always_2d=False)
+            if data.ndim > 1:
+                data = data.mean(axis=1)
             return data, sr
         except Exception as e:
             logger.error(f"Failed to load {file_path}: {e}")
@@ -76,13 +236,33 @@ class AudioAugmenter:
             True if successful, False otherwise
         """
         try:
-            sf.write(output_path, audio, sample_rate)
+            sf.write(output_path, audio, sample_rate, subtype='PCM_16')
             return True
         except Exception as e:
             logger.error(f"Failed to save {output_path}: {e}")
             return False
     
-    def add_noise(self, audio: np.ndarray, noise: np.ndarray, snr_db: float = 10.0) -> np.ndarray:
+    def save_bundle(self, variants: Dict[str, np.ndarray], sample_rate: int, output_path: Path) -> bool:
+        """
+        Save all variants of one sample to a single uncompressed .npz file.
+        
+        Args:
+            variants: Mapping of variant name to audio data
+            sample_rate: Sample rate in Hz (stored as "sample_rate")
+            output_path: Path to save the bundle to
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            np.savez(output_path, sample_rate=sample_rate, **variants)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to save {output_path}: {e}")
+            return False
+    
+    def add_noise(self, audio: np.ndarray, noise: np.ndarray, snr_db: float = 10.0,
+                  out: Optional[np.ndarray] = None) -> np.ndarray:
         """
         Add background noise to audio with specified SNR.
         
@@ -90,30 +270,39 @@ class AudioAugmenter:
             audio: Clean audio signal
             noise: Noise signal
             snr_db: Signal-to-noise ratio in dB
+            out: Optional contiguous float32 buffer to write the result into
             
         Returns:
-            Audio with added noise
+            Audio with added noise (an unmodified copy if the noise is silent)
         """
         # Ensure noise is same length as audio
         if len(noise) < len(audio):
-            # Repeat noise if too short
-            repeats = int(np.ceil(len(audio) / len(noise)))
-            noise = np.tile(noise, repeats)[:len(audio)]
+            # Repeat noise if too short, reusing the scratch buffer when it fits
+            if self._noise_scratch is None:
+                self._noise_scratch = np.empty(MAX_AUDIO_SAMPLES, dtype=np.float32)
+            if len(audio) <= len(self._noise_scratch):
+                tiled = self._noise_scratch[:len(audio)]
+                for start in range(0, len(audio), len(noise)):
+                    chunk = tiled[start:start + len(noise)]
+                    chunk[:] = noise[:len(chunk)]
+                noise = tiled
+            else:
+                repeats = int(np.ceil(len(audio) / len(noise)))
+                noise = np.tile(noise, repeats)[:len(audio)]
         else:
             # Trim noise if too long
-            start = random.randint(0, len(noise) - len(audio))
+            start = int(_RNG.integers(0, len(noise) - len(audio) + 1))
             noise = noise[start:start + len(audio)]
         
-        # Calculate signal and noise power
-        signal_power = np.mean(audio ** 2)
-        noise_power = np.mean(noise ** 2)
-        
-        # Calculate required noise scaling factor
-        snr_linear = 10 ** (snr_db / 10.0)
-        scale = np.sqrt(signal_power / (snr_linear * noise_power))
-        
-        # Add scaled noise to signal
-        return audio + scale * noise
+        # Contiguous float32 inputs dispatch to the vectorized kernel path
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        noise = np.ascontiguousarray(noise, dtype=np.float32)
+        if out is None:
+            out = np.empty_like(audio)
+        # Zero noise power has no valid scale; the kernel then copies audio
+        if not _add_noise_kernel(audio, noise, snr_db, out):
+            logger.warning("Noise segment is silent (zero power); audio left without added noise")
+        return out
     
     def change_volume(self, audio: np.ndarray, factor: float) -> np.ndarray:
         """
@@ -128,30 +317,32 @@ class AudioAugmenter:
         """
         return audio * factor
     
-    def time_stretch(self, audio: np.ndarray, rate: float) -> np.ndarray:
+    def time_stretch(self, audio: np.ndarray, sample_rate: int, rate: float) -> np.ndarray:
         """
         Stretch or compress audio in time.
         
         Args:
             audio: Audio signal
+            sample_rate: Sample rate of the audio in Hz
             rate: Stretch factor (0.8 = slower, 1.2 = faster)
             
         Returns:
             Time-stretched audio
         """
-        # Simple time stretching via resampling
-        indices = np.arange(0, len(audio), rate)
-        indices = indices[indices < len(audio)].astype(int)
-        return audio[indices]
+        # Band-limited resampling along time (axis 0, as soundfile lays out
+        # (frames, channels)); kaiser_fast is transparent for small stretches
+        return resampy.resample(audio, int(sample_rate * rate), sample_rate,
+                                filter='kaiser_fast', axis=0)
     
-    def augment_sample(self, audio_path: Path, background_files: List[Path], 
-                      output_prefix: str) -> int:
+    def augment_sample(self, audio_path: Path, output_prefix: str) -> int:
         """
         Create multiple augmented versions of a single audio sample.
         
+        Background noise is drawn from the files found by augment_all and
+        loaded through the per-(file, sample rate) cache.
+        
         Args:
             audio_path: Path to original audio file
-            background_files: List of background noise files
             output_prefix: Prefix for output filenames
             
         Returns:
@@ -161,48 +352,54 @@ class AudioAugmenter:
         if audio is None:
             return 0
         
-        count = 0
         base_name = audio_path.stem
         
-        # Original (copy)
-        output_path = self.augmented_dir / f"{output_prefix}_{base_name}_original.wav"
-        if self.save_audio(audio, sr, output_path):
-            count += 1
+        # Pick background noise up front so it can share the variant matrix
+        noises: List[np.ndarray] = []
+        if self._bg_files:
+            picks = _RNG.choice(len(self._bg_files), size=min(3, len(self._bg_files)), replace=False)
+            for pick in picks:
+                noise = _load_background(self._bg_files[pick], sr, str(self.cache_dir))
+                if noise is not None:
+                    noises.append(noise)
+        
+        # Same-length variants share one (K, N) array: original and volume rows
+        # come from a single broadcast multiply, noise rows are mixed in place
+        vol_factors = [1.0, 0.7, 1.3]
+        names = ["original"] + [f"vol{factor}" for factor in vol_factors[1:]]
+        names += [f"noise{i}" for i in range(len(noises))]
+        variants = np.empty((len(names), len(audio)), dtype=np.float32)
+        np.multiply(np.array(vol_factors, dtype=np.float32)[:, None], audio,
+                    out=variants[:len(vol_factors)])
+        for row, noise in enumerate(noises, len(vol_factors)):
+            self.add_noise(audio, noise, snr_db=15.0, out=variants[row])
+        
+        outputs: Dict[str, np.ndarray] = dict(zip(names, variants))
+        writes: List[Future] = []
+        
+        def submit_wav(name: str, augmented: np.ndarray) -> None:
+            output_path = self.augmented_dir / f"{output_prefix}_{base_name}_{name}.wav"
+            writes.append(self._get_io_pool().submit(self.save_audio, augmented, sr, output_path))
         
-        # Volume variations
-        for vol_factor in [0.7, 1.3]:
-            augmented = self.change_volume(audio, vol_factor)
-            output_path = self.augmented_dir / f"{output_prefix}_{base_name}_vol{vol_factor}.wav"
-            if self.save_audio(augmented, sr, output_path):
-                count += 1
+        # WAV rows go to the writer threads now, overlapping the time stretch below
+        if self.output_format == "wav":
+            for name, augmented in outputs.items():
+                submit_wav(name, augmented)
         
-        # Speed variations
+        # Speed variations (different length, kept separate)
         for speed_factor in [0.9, 1.1]:
-            augmented = self.time_stretch(audio, speed_factor)
-            output_path = self.augmented_dir / f"{output_prefix}_{base_name}_speed{speed_factor}.wav"
-            if self.save_audio(augmented, sr, output_path):
-                count += 1
-        
-        # Add background noise (if available)
-        if background_files:
-            for i, bg_file in enumerate(random.sample(background_files, min(3, len(background_files)))):
-                noise, noise_sr = self.load_audio(bg_file)
-                if noise is not None:
-                    # Resample noise if needed
-                    if noise_sr != sr:
-                        # Simple resampling (for production, use librosa.resample)
-                        noise = np.interp(
-                            np.linspace(0, len(noise), int(len(noise) * sr / noise_sr)),
-                            np.arange(len(noise)),
-                            noise
-                        )
-                    
-                    augmented = self.add_noise(audio, noise, snr_db=15.0)
-                    output_path = self.augmented_dir / f"{output_prefix}_{base_name}_noise{i}.wav"
-                    if self.save_audio(augmented, sr, output_path):
-                        count += 1
-        
-        return count
+            name = f"speed{speed_factor}"
+            outputs[name] = self.time_stretch(audio, sr, speed_factor)
+            if self.output_format == "wav":
+                submit_wav(name, outputs[name])
+        
+        # A bundle needs every variant, so it is written directly at the end
+        if self.output_format == "npz":
+            output_path = self.augmented_dir / f"{output_prefix}_{base_name}.npz"
+            return len(outputs) if self.save_bundle(outputs, sr, output_path) else 0
+        
+        # Wait for pending writes so the count reflects files on disk
+        return sum(write.result() for write in writes)
     
     def augment_all(self) -> None:
         """Augment all positive samples."""
@@ -210,37 +407,136 @@ class AudioAugmenter:
         logger.info("AUDIO DATA AUGMENTATION")
         logger.info("=" * 50)
         
-        # Get all positive samples
-        positive_files = list(self.positive_dir.glob("*.wav"))
-        logger.info(f"Found {len(positive_files)} positive samples")
+        # Stream positive samples; only check that at least one exists up front
+        positive_files = self.positive_dir.glob("*.wav")
+        first_positive = next(positive_files, None)
+        if first_positive is None:
+            logger.error("No positive samples found! Please record samples first.")
+            return
         
-        # Get background noise files
-        background_files = list(self.background_dir.rglob("*.wav"))
+        # Get background noise files (kept as a sequence for random sampling)
+        background_files = _scan_wav_files(str(self.background_dir))
         logger.info(f"Found {len(background_files)} background noise files")
         
-        if not positive_files:
-            logger.error("No positive samples found! Please record samples first.")
-            return
+        # Decode background noise once at the common rate; workers then only
+        # memory-map the cached arrays instead of decoding per positive sample
+        cache_dir = str(self.cache_dir)
+        self._bg_files = tuple(
+            bg_file for bg_file in background_files
+            if _load_background(bg_file, BACKGROUND_SAMPLE_RATE, cache_dir) is not None
+        )
         
-        # Augment each sample
+        # One child seed per sample keeps results independent of which worker
+        # picks up which file; log the entropy so a run can be reproduced
+        seed_root = np.random.SeedSequence(self.seed)
+        logger.info(f"Random seed: {seed_root.entropy}")
+        
+        # Augment samples in parallel; each file is independent.
+        # Use "spawn" explicitly so workers never inherit a forked parent state.
         total_augmented = 0
-        for i, audio_file in enumerate(positive_files, 1):
-            logger.info(f"Augmenting {i}/{len(positive_files)}: {audio_file.name}")
-            count = self.augment_sample(audio_file, background_files, "aug")
-            total_augmented += count
-            logger.info(f"  → Created {count} variations")
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(str(self.data_dir), self._bg_files, self.output_format),
+        ) as executor:
+            futures = {
+                executor.submit(_augment_worker, audio_file, seed_root.spawn(1)[0]): audio_file
+                for audio_file in chain([first_positive], positive_files)
+            }
+            num_positive = len(futures)
+            logger.info(f"Found {num_positive} positive samples")
+            for i, future in enumerate(as_completed(futures), 1):
+                audio_file = futures[future]
+                # One bad file must not abort the whole parallel run
+                try:
+                    _, count = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to augment {audio_file}: {e}")
+                    count = 0
+                total_augmented += count
+                logger.info(f"Augmented {i}/{num_positive}: {audio_file.name} → {count} variations")
         
         logger.info("=" * 50)
         logger.info(f"✓ Augmentation complete!")
-        logger.info(f"  Original samples: {len(positive_files)}")
+        logger.info(f"  Original samples: {num_positive}")
         logger.info(f"  Augmented samples: {total_augmented}")
-        logger.info(f"  Total dataset size: {len(positive_files) + total_augmented}")
+        logger.info(f"  Total dataset size: {num_positive + total_augmented}")
         logger.info("=" * 50)
 
 
+def _scan_wav_files(root: str) -> Tuple[str, ...]:
+    """
+    Recursively collect WAV file paths below a directory.
+    
+    Uses os.scandir directly to avoid building a Path object per entry.
+    The extension match is case-insensitive, like Path.rglob on Windows.
+    
+    Args:
+        root: Directory to scan
+        
+    Returns:
+        Tuple of WAV file paths
+    """
+    found: List[str] = []
+    pending = [root]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.name.lower().endswith(".wav"):
+                        found.append(entry.path)
+        except OSError:
+            continue
+    return tuple(found)
+
+
+def _init_worker(data_dir: str, background_files: Tuple[str, ...], output_format: str) -> None:
+    """
+    Set up per-process augmenter state in a pool worker.
+    
+    Args:
+        data_dir: Base directory containing audio data
+        background_files: Background noise files with a warm cache entry
+        output_format: Output format for augmented samples
+    """
+    global _worker_augmenter
+    _worker_augmenter = AudioAugmenter(data_dir, num_workers=1, output_format=output_format)
+    _worker_augmenter._bg_files = background_files
+    # Shut the writer pool down when the worker process exits
+    multiprocessing.util.Finalize(None, _worker_augmenter.close, exitpriority=10)
+
+
+def _augment_worker(audio_path: Path, seed: np.random.SeedSequence) -> Tuple[Path, int]:
+    """
+    Augment a single positive sample inside a pool worker.
+    
+    Args:
+        audio_path: Path to original audio file
+        seed: Child seed sequence for this sample's random choices
+        
+    Returns:
+        Tuple of (audio_path, number of augmented samples created)
+    """
+    global _RNG
+    _RNG = np.random.default_rng(seed)
+    count = _worker_augmenter.augment_sample(audio_path, "aug")
+    return audio_path, count
+
+
 def main():
     """Main entry point."""
-    augmenter = AudioAugmenter()
+    parser = argparse.ArgumentParser(description="Augment wake-word training samples")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Seed for reproducible augmentation (default: random)")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default="wav",
+                        help="One WAV per variant, or one .npz bundle per sample")
+    args = parser.parse_args()
+    
+    augmenter = AudioAugmenter(output_format=args.output_format, seed=args.seed)
     augmenter.augment_all()
 
 
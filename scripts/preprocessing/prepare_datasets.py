@@ -11,13 +11,19 @@ Author: Manus AI (Operation Nexus)
 """
 
 import os
-import urllib.request
+import argparse
+import shutil
 import zipfile
 import tarfile
 from pathlib import Path
-from typing import List
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import parsedate_to_datetime
+import threading
 import logging
 
+import requests
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -26,6 +32,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Google Speech Commands archive (source of both background and negative samples)
+SPEECH_COMMANDS_URL = "http://download.tensorflow.org/data/speech_commands_v0.02.tar.gz"
+BACKGROUND_NOISE_PREFIX = "_background_noise_/"
+
+# Parallel HTTP Range download settings
+DOWNLOAD_CONNECTIONS = 8
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = 30
+DOWNLOAD_RETRIES = 3
+
 
 class DatasetPreparer:
     """Handles downloading and preparing datasets for wake-word training."""
@@ -41,9 +57,10 @@ class DatasetPreparer:
         self.positive_dir = self.base_dir / "positive"
         self.negative_dir = self.base_dir / "negative"
         self.background_dir = self.base_dir / "background"
+        self.cache_dir = self.base_dir / "_downloads"
         
         # Create directories
-        for directory in [self.positive_dir, self.negative_dir, self.background_dir]:
+        for directory in [self.positive_dir, self.negative_dir, self.background_dir, self.cache_dir]:
             directory.mkdir(parents=True, exist_ok=True)
     
     def download_file(self, url: str, destination: Path) -> bool:
@@ -59,33 +76,163 @@ class DatasetPreparer:
         """
         try:
             logger.info(f"Downloading {url}...")
-            urllib.request.urlretrieve(url, destination)
+            try:
+                head = requests.head(url, allow_redirects=True, timeout=DOWNLOAD_TIMEOUT)
+                head.raise_for_status()
+            except requests.RequestException as e:
+                # Some servers reject HEAD (403/405); a plain GET may still work
+                logger.warning(f"⚠ HEAD request failed ({e}); using a single connection")
+                head = None
+            
+            # Split into byte ranges when the server supports it
+            size = int(head.headers.get("Content-Length", 0)) if head is not None else 0
+            if size and head.headers.get("Accept-Ranges") == "bytes":
+                self._download_ranges(head.url, destination, size)
+            else:
+                self._download_stream(head.url if head is not None else url, destination)
+            
             logger.info(f"✓ Downloaded to {destination}")
             return True
         except Exception as e:
             logger.error(f"✗ Failed to download {url}: {e}")
             return False
     
-    def extract_archive(self, archive_path: Path, extract_to: Path) -> bool:
+    def _download_stream(self, url: str, destination: Path) -> None:
+        """
+        Download a file over a single connection.
+        
+        Args:
+            url: URL to download from
+            destination: Local file path to save to
+        """
+        with requests.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            response.raise_for_status()
+            with open(destination, 'wb') as f:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+    
+    def _download_ranges(self, url: str, destination: Path, size: int) -> None:
+        """
+        Download a file as parallel HTTP byte ranges into a pre-sized file.
+        
+        Each range is retried on its own; if one still fails, the remaining
+        ranges are cancelled instead of being downloaded to completion.
+        
+        Args:
+            url: URL to download from
+            destination: Local file path to save to
+            size: Total file size in bytes
+        """
+        with open(destination, 'wb') as f:
+            f.truncate(size)
+        
+        part_size = -(-size // DOWNLOAD_CONNECTIONS)
+        ranges = [(lo, min(lo + part_size, size) - 1) for lo in range(0, size, part_size)]
+        abort = threading.Event()
+        
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            futures = [
+                executor.submit(self._download_range, url, destination, lo, hi, abort)
+                for lo, hi in ranges
+            ]
+            try:
+                received = 0
+                for done, future in enumerate(as_completed(futures), 1):
+                    received += future.result()
+                    logger.info(f"  Range {done}/{len(ranges)} complete "
+                                f"({received / size:.0%} of {size / 1024 ** 2:.0f} MB)")
+            except BaseException:
+                # Stop the other ranges at their next chunk instead of
+                # waiting for them to finish
+                abort.set()
+                for future in futures:
+                    future.cancel()
+                raise
+    
+    def _download_range(self, url: str, destination: Path, start: int, end: int,
+                        abort: threading.Event) -> int:
+        """
+        Download one byte range and write it at its offset in destination.
+        
+        Failed attempts are retried from the last byte written.
+        
+        Args:
+            url: URL to download from
+            destination: Pre-sized local file to write into
+            start: First byte offset (inclusive)
+            end: Last byte offset (inclusive)
+            abort: Event set when the overall download has failed
+            
+        Returns:
+            Number of bytes written
+            
+        Raises:
+            ValueError: If the server ignores the range request
+        """
+        position = start
+        for attempt in range(1, DOWNLOAD_RETRIES + 1):
+            try:
+                headers = {"Range": f"bytes={position}-{end}"}
+                with requests.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        raise ValueError(f"Server ignored range request for bytes {position}-{end}")
+                    # Each thread uses its own handle; seek+write works on all platforms
+                    with open(destination, 'r+b') as f:
+                        f.seek(position)
+                        for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                            if abort.is_set():
+                                return position - start
+                            f.write(chunk)
+                            position += len(chunk)
+                if position > end:
+                    return position - start
+                raise IOError(f"Connection closed at byte {position} of range {start}-{end}")
+            except (requests.RequestException, OSError) as e:
+                if abort.is_set() or attempt == DOWNLOAD_RETRIES:
+                    raise
+                logger.warning(f"⚠ Range {start}-{end} failed ({e}); "
+                               f"retrying from byte {position} ({attempt}/{DOWNLOAD_RETRIES})")
+        return position - start
+    
+    def extract_archive(self, archive_path: Path, extract_to: Path,
+                        member_prefix: Optional[str] = None,
+                        exclude_prefix: bool = False) -> bool:
         """
         Extract a zip or tar archive.
         
+        Tar archives are read in streaming mode and members are extracted one
+        at a time, so unused members are never written to disk.
+        
         Args:
             archive_path: Path to archive file
             extract_to: Directory to extract to
+            member_prefix: Optional path prefix; only members under it are
+                extracted
+            exclude_prefix: Invert member_prefix and extract every member
+                outside it instead
             
         Returns:
             True if successful, False otherwise
         """
+        def wanted(name: str) -> bool:
+            if not member_prefix:
+                return True
+            return _has_prefix(name, member_prefix) != exclude_prefix
+        
         try:
             logger.info(f"Extracting {archive_path.name}...")
             
             if archive_path.suffix == '.zip':
                 with zipfile.ZipFile(archive_path, 'r') as zip_ref:
-                    zip_ref.extractall(extract_to)
+                    members = [name for name in zip_ref.namelist() if wanted(name)]
+                    zip_ref.extractall(extract_to, members=members)
             elif archive_path.suffix in ['.tar', '.gz', '.tgz']:
-                with tarfile.open(archive_path, 'r:*') as tar_ref:
-                    tar_ref.extractall(extract_to)
+                # 'r|*' streams sequentially without building a member index
+                with tarfile.open(archive_path, 'r|*') as tar_ref:
+                    for member in tar_ref:
+                        if wanted(member.name):
+                            tar_ref.extract(member, extract_to)
             else:
                 logger.error(f"Unknown archive format: {archive_path.suffix}")
                 return False
@@ -96,6 +243,48 @@ class DatasetPreparer:
             logger.error(f"✗ Failed to extract {archive_path}: {e}")
             return False
     
+    def _get_speech_commands(self) -> Optional[Path]:
+        """
+        Download the Speech Commands archive into the shared cache once.
+        
+        A cached archive is reused when its size matches the remote file and
+        it is not older than the remote Last-Modified time.
+        
+        Returns:
+            Path to the cached archive, or None if the download failed
+        """
+        archive_path = self.cache_dir / "speech_commands_v0.02.tar.gz"
+        
+        if archive_path.exists():
+            try:
+                head = requests.head(SPEECH_COMMANDS_URL, allow_redirects=True, timeout=DOWNLOAD_TIMEOUT)
+                head.raise_for_status()
+                # A missing or zero Content-Length means the size is unknown
+                remote_size = int(head.headers.get("Content-Length", 0)) or None
+                last_modified = head.headers.get("Last-Modified")
+                remote_mtime = parsedate_to_datetime(last_modified).timestamp() if last_modified else None
+            except Exception as e:
+                logger.warning(f"⚠ Could not check {SPEECH_COMMANDS_URL}: {e}")
+                remote_size = remote_mtime = None
+            
+            # Unknown values are treated as matching; the cached file's mtime
+            # is its download time, so it must not predate the remote copy
+            stat = archive_path.stat()
+            size_ok = remote_size is None or remote_size == stat.st_size
+            mtime_ok = remote_mtime is None or stat.st_mtime >= remote_mtime
+            if size_ok and mtime_ok:
+                logger.info(f"✓ Using cached archive {archive_path}")
+                return archive_path
+            logger.info(f"Cached archive {archive_path} is out of date; downloading again")
+        
+        # Download to a partial file so an interrupted run is never mistaken
+        # for a complete (pre-sized) archive
+        partial_path = archive_path.with_name(archive_path.name + ".part")
+        if not self.download_file(SPEECH_COMMANDS_URL, partial_path):
+            return None
+        partial_path.replace(archive_path)
+        return archive_path
+    
     def download_background_noise(self) -> bool:
         """
         Download background noise dataset from Google's Speech Commands.
@@ -105,18 +294,15 @@ class DatasetPreparer:
         """
         logger.info("=== Downloading Background Noise Dataset ===")
         
-        # Google Speech Commands background noise
-        url = "http://download.tensorflow.org/data/speech_commands_v0.02.tar.gz"
-        archive_path = self.background_dir / "speech_commands_v0.02.tar.gz"
-        
-        if not self.download_file(url, archive_path):
+        archive_path = self._get_speech_commands()
+        if archive_path is None:
             return False
         
-        if not self.extract_archive(archive_path, self.background_dir):
+        # Only the background noise folder is needed here
+        if not self.extract_archive(archive_path, self.background_dir,
+                                    member_prefix=BACKGROUND_NOISE_PREFIX):
             return False
         
-        # Clean up archive
-        archive_path.unlink()
         logger.info("✓ Background noise dataset ready")
         return True
     
@@ -131,17 +317,15 @@ class DatasetPreparer:
         
         # Use Google Speech Commands for negative samples
         # (words like "yes", "no", "up", "down", etc.)
-        url = "http://download.tensorflow.org/data/speech_commands_v0.02.tar.gz"
-        archive_path = self.negative_dir / "speech_commands_v0.02.tar.gz"
-        
-        if not self.download_file(url, archive_path):
+        archive_path = self._get_speech_commands()
+        if archive_path is None:
             return False
         
-        if not self.extract_archive(archive_path, self.negative_dir):
+        # Everything except the background noise folder
+        if not self.extract_archive(archive_path, self.negative_dir,
+                                    member_prefix=BACKGROUND_NOISE_PREFIX, exclude_prefix=True):
             return False
         
-        # Clean up archive
-        archive_path.unlink()
         logger.info("✓ Negative samples dataset ready")
         return True
     
@@ -156,8 +340,20 @@ class DatasetPreparer:
             else:
                 logger.warning(f"✗ {directory.name}: Directory not found")
     
-    def prepare_all(self) -> None:
-        """Execute full data preparation pipeline."""
+    def clean_downloads(self) -> None:
+        """Delete cached archives to free disk space (they are re-downloaded if needed)."""
+        if self.cache_dir.exists():
+            shutil.rmtree(self.cache_dir)
+            logger.info(f"✓ Removed download cache {self.cache_dir}")
+    
+    def prepare_all(self, keep_downloads: bool = True) -> None:
+        """
+        Execute full data preparation pipeline.
+        
+        Args:
+            keep_downloads: Keep downloaded archives in the cache directory so
+                later runs can skip the download
+        """
         logger.info("=" * 50)
         logger.info("WAKE-WORD DATA PREPARATION")
         logger.info("=" * 50)
@@ -169,6 +365,13 @@ class DatasetPreparer:
         # Verify structure
         self.verify_structure()
         
+        if keep_downloads:
+            cached_bytes = sum(f.stat().st_size for f in self.cache_dir.glob("*") if f.is_file())
+            logger.info(f"Downloaded archives kept in {self.cache_dir} "
+                        f"({cached_bytes / 1024 ** 3:.1f} GB); rerun with --clean-downloads to remove")
+        else:
+            self.clean_downloads()
+        
         logger.info("=" * 50)
         logger.info("✓ Data preparation complete!")
         logger.info("=" * 50)
@@ -178,10 +381,32 @@ class DatasetPreparer:
         logger.info("3. Train your model: python ../training/train_openwakeword.py")
 
 
+def _has_prefix(name: str, prefix: str) -> bool:
+    """
+    Check whether an archive member name lies under a path prefix.
+    
+    Args:
+        name: Archive member name (a leading "./" is ignored)
+        prefix: Path prefix such as "_background_noise_/"
+        
+    Returns:
+        True if the member is under the prefix or is the prefix directory itself
+    """
+    if name.startswith("./"):
+        name = name[2:]
+    # Directory entries have no trailing slash, e.g. "./_background_noise_"
+    return name.startswith(prefix) or name == prefix.rstrip("/")
+
+
 def main():
     """Main entry point."""
+    parser = argparse.ArgumentParser(description="Download and prepare wake-word datasets")
+    parser.add_argument("--clean-downloads", action="store_true",
+                        help="Delete downloaded archives after extraction")
+    args = parser.parse_args()
+    
     preparer = DatasetPreparer()
-    preparer.prepare_all()
+    preparer.prepare_all(keep_downloads=not args.clean_downloads)
 
 
 if __name__ == "__main__":
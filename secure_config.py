@@ -10,7 +10,7 @@ Author: Manus AI (Operation Nexus)
 
 import os
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, Tuple
 import logging
 
 try:
@@ -21,6 +21,31 @@ except ImportError:
     logging.warning("python-dotenv not installed. Install with: pip install python-dotenv")
 
 
+# Configuration schema: (config key, type, default). Each key is read from the
+# upper-cased environment variable; keys defaulting to None are optional and
+# omitted from the config when unset.
+_SCHEMA: Tuple[Tuple[str, Callable[[str], Any], Any], ...] = (
+    # API Keys
+    ('openai_api_key', str, None),
+    ('porcupine_access_key', str, None),
+    ('elevenlabs_api_key', str, None),
+    
+    # Voice Assistant Settings
+    ('wake_word', str, 'computer'),
+    ('tts_voice', str, 'de-DE-KatjaNeural'),
+    ('stt_model', str, 'de'),
+    
+    # Audio Settings
+    ('sample_rate', int, 16000),
+    ('chunk_samples', int, 1280),
+    ('silence_timeout', float, 2.0),
+    
+    # Model Paths
+    ('wake_word_model_path', str, 'models/computer.ppn'),
+    ('vosk_model_path', str, 'models/vosk-model-de'),
+)
+
+
 class SecureConfig:
     """Manages secure configuration and API keys."""
     
@@ -49,24 +74,13 @@ class SecureConfig:
     
     def _load_config(self) -> None:
         """Load configuration from environment variables."""
-        # API Keys
-        self.config['openai_api_key'] = os.getenv('OPENAI_API_KEY')
-        self.config['porcupine_access_key'] = os.getenv('PORCUPINE_ACCESS_KEY')
-        self.config['elevenlabs_api_key'] = os.getenv('ELEVENLABS_API_KEY')
-        
-        # Voice Assistant Settings
-        self.config['wake_word'] = os.getenv('WAKE_WORD', 'computer')
-        self.config['tts_voice'] = os.getenv('TTS_VOICE', 'de-DE-KatjaNeural')
-        self.config['stt_model'] = os.getenv('STT_MODEL', 'de')
-        
-        # Audio Settings
-        self.config['sample_rate'] = int(os.getenv('SAMPLE_RATE', '16000'))
-        self.config['chunk_samples'] = int(os.getenv('CHUNK_SAMPLES', '1280'))
-        self.config['silence_timeout'] = float(os.getenv('SILENCE_TIMEOUT', '2.0'))
-        
-        # Model Paths
-        self.config['wake_word_model_path'] = os.getenv('WAKE_WORD_MODEL_PATH', 'models/computer.ppn')
-        self.config['vosk_model_path'] = os.getenv('VOSK_MODEL_PATH', 'models/vosk-model-de')
+        env = os.environ
+        for key, cast, default in _SCHEMA:
+            value = env.get(key.upper())
+            if value is not None:
+                self.config[key] = cast(value)
+            elif default is not None:
+                self.config[key] = default
     
     def get(self, key: str, default: Any = None) -> Any:
         """
@@ -162,6 +176,42 @@ def get_config() -> SecureConfig:
     return _config_instance
 
 
+# Frequently read audio settings exposed as module constants, e.g.
+# ``from secure_config import SAMPLE_RATE``. They are resolved from the
+# global configuration on first access and then cached as module globals,
+# so hot audio loops avoid a get_config().get() lookup per frame.
+_HOT_SETTINGS: Dict[str, str] = {
+    'SAMPLE_RATE': 'sample_rate',
+    'CHUNK_SAMPLES': 'chunk_samples',
+    'SILENCE_TIMEOUT': 'silence_timeout',
+}
+
+SAMPLE_RATE: int
+CHUNK_SAMPLES: int
+SILENCE_TIMEOUT: float
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Resolve hot audio settings lazily on first module attribute access.
+    
+    Args:
+        name: Attribute name
+        
+    Returns:
+        Configuration value for the setting
+        
+    Raises:
+        AttributeError: If name is not a known module attribute
+    """
+    key = _HOT_SETTINGS.get(name)
+    if key is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = get_config().get(key)
+    globals()[name] = value
+    return value
+
+
 def main():
     """Test configuration loading."""
     config = get_config()